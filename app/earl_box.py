@@ -1,55 +1,78 @@
+from pathlib import Path
+from typing import Optional
 from nicegui import ui, events, app
 from fastapi import HTTPException
 from fastapi.responses import FileResponse
 
 from app.file_service import (
-    save_upload_event,
-    get_file_stats,
+    save_upload_event_async,
+    refresh_upload_stats,
     get_file_path,
-    get_all_uploaded_files,
+    get_file_download_info,
+    get_uploaded_files,
     format_file_size,
     MAX_FILE_SIZE,
+    FILES_PAGE_SIZE,
 )
+from app.models import UploadedFile, UploadedFileSummary
+
+STATIC_DIR = Path(__file__).parent.parent / "static"
+
+# Shared head entries and the static mount outlive app.reset(), so repeated startups must not add them again
+_assets_registered = False
+
+
+def _register_assets() -> None:
+    """Register the theme, stylesheet and script shared by every page, instead of adding them per render."""
+    global _assets_registered
+    # app.config is replaced whenever the app is reset, so the brand colors are applied on every create()
+    app.config.quasar_config["brand"].update(
+        primary="#2563eb",
+        secondary="#64748b",
+        accent="#10b981",
+        positive="#10b981",
+        negative="#ef4444",
+        warning="#f59e0b",
+        info="#3b82f6",
+    )
+    if _assets_registered:
+        return
+    app.add_static_files("/static", STATIC_DIR)
+    ui.add_head_html('<link rel="stylesheet" href="/static/earl.css">', shared=True)
+    ui.add_head_html('<script src="/static/earl.js"></script>', shared=True)
+    _assets_registered = True
 
 
 def create() -> None:
     """Create Earl Box application routes and UI."""
+    _register_assets()
 
     @app.get("/files/{filename}")
-    async def serve_file(filename: str):
+    def serve_file(filename: str):
         """Serve uploaded files publicly."""
+        # Sync handler: FastAPI runs it in its threadpool, keeping the DB lookup and stat off the event loop
         file_path = get_file_path(filename)
         if file_path is None:
             raise HTTPException(status_code=404, detail="File not found")
-        return FileResponse(file_path)
+        download_info = get_file_download_info(filename)
+        if download_info is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        try:
+            stat_result = file_path.stat()
+        except FileNotFoundError:
+            # The path lookup is memoized briefly, so the file may have been removed since
+            raise HTTPException(status_code=404, detail="File not found")
+        return FileResponse(
+            file_path,
+            stat_result=stat_result,
+            media_type=download_info.content_type,
+            filename=download_info.original_filename,
+            content_disposition_type="inline",
+        )
 
     @ui.page("/")
     def index():
         """Main Earl Box page."""
-        # Apply modern theme
-        ui.colors(
-            primary="#2563eb",
-            secondary="#64748b",
-            accent="#10b981",
-            positive="#10b981",
-            negative="#ef4444",
-            warning="#f59e0b",
-            info="#3b82f6",
-        )
-
-        ui.add_head_html("""
-        <style>
-        .earl-gradient {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        }
-        .upload-card {
-            background: rgba(255, 255, 255, 0.95);
-            backdrop-filter: blur(10px);
-            border: 1px solid rgba(255, 255, 255, 0.3);
-        }
-        </style>
-        """)
-
         # Header with gradient background
         with ui.row().classes("w-full earl-gradient p-8 text-white"):
             with ui.column().classes("w-full items-center"):
@@ -58,26 +81,42 @@ def create() -> None:
 
         # Main content area
         with ui.column().classes("w-full max-w-4xl mx-auto p-6 gap-6"):
-            # Statistics card
-            stats_container = ui.row().classes("w-full gap-4 mb-6")
+            # Statistics cards, bound to the running totals so uploads update them without re-querying
+            with ui.row().classes("w-full gap-4 mb-6"):
+                stats = refresh_upload_stats()
+
+                # Total files card
+                with ui.card().classes("p-6 bg-white shadow-lg rounded-xl hover:shadow-xl transition-shadow"):
+                    ui.label("Total Files").classes("text-sm text-gray-500 uppercase tracking-wider")
+                    ui.label().bind_text_from(stats, "total_files", backward=str).classes(
+                        "text-3xl font-bold text-blue-600 mt-2"
+                    )
+                    ui.icon("folder").classes("text-blue-500 text-2xl")
+
+                # Total size card
+                with ui.card().classes("p-6 bg-white shadow-lg rounded-xl hover:shadow-xl transition-shadow"):
+                    ui.label("Total Size").classes("text-sm text-gray-500 uppercase tracking-wider")
+                    ui.label().bind_text_from(stats, "total_size_bytes", backward=format_file_size).classes(
+                        "text-3xl font-bold text-green-600 mt-2"
+                    )
+                    ui.icon("storage").classes("text-green-500 text-2xl")
 
             # Upload section
             with ui.card().classes("upload-card p-6 shadow-xl rounded-xl"):
                 ui.label("Upload Files").classes("text-2xl font-bold text-gray-800 mb-4")
                 ui.label(f"Maximum file size: {format_file_size(MAX_FILE_SIZE)}").classes("text-sm text-gray-600 mb-4")
 
-                def handle_upload(e: events.UploadEventArguments) -> None:
+                async def handle_upload(e: events.UploadEventArguments) -> None:
                     """Handle file upload."""
                     try:
-                        uploaded_file = save_upload_event(e)
+                        uploaded_file = await save_upload_event_async(e)
                         if uploaded_file is None:
                             ui.notify("Failed to upload file. Check file size limit.", type="negative")
                         else:
                             ui.notify(
                                 f'File "{uploaded_file.original_filename}" uploaded successfully!', type="positive"
                             )
-                            refresh_stats()
-                            refresh_files()
+                            add_file(uploaded_file)
                     except Exception as ex:
                         import logging
 
@@ -89,31 +128,55 @@ def create() -> None:
             # Files list section
             files_container = ui.column().classes("w-full")
 
-            def refresh_stats() -> None:
-                """Refresh statistics display."""
-                stats_container.clear()
-                with stats_container:
-                    stats = get_file_stats()
-
-                    # Total files card
-                    with ui.card().classes("p-6 bg-white shadow-lg rounded-xl hover:shadow-xl transition-shadow"):
-                        ui.label("Total Files").classes("text-sm text-gray-500 uppercase tracking-wider")
-                        ui.label(str(stats.total_files)).classes("text-3xl font-bold text-blue-600 mt-2")
-                        ui.icon("folder").classes("text-blue-500 text-2xl")
-
-                    # Total size card
-                    with ui.card().classes("p-6 bg-white shadow-lg rounded-xl hover:shadow-xl transition-shadow"):
-                        ui.label("Total Size").classes("text-sm text-gray-500 uppercase tracking-wider")
-                        ui.label(format_file_size(stats.total_size_bytes)).classes(
-                            "text-3xl font-bold text-green-600 mt-2"
-                        )
-                        ui.icon("storage").classes("text-green-500 text-2xl")
+            files_list: Optional[ui.column] = None
+            load_more_button: Optional[ui.button] = None
+            loaded_count = 0
+
+            def render_file_card(file: UploadedFile | UploadedFileSummary) -> ui.card:
+                """Render a single file card in the current container."""
+                with ui.card().classes("p-4 bg-white shadow-md rounded-lg hover:shadow-lg transition-shadow") as card:
+                    with ui.row().classes("w-full items-center justify-between"):
+                        with ui.column().classes("flex-1"):
+                            ui.label(file.original_filename).classes("font-semibold text-lg text-gray-800")
+                            with ui.row().classes("gap-4 mt-1"):
+                                ui.label(f"Size: {format_file_size(file.file_size)}").classes("text-sm text-gray-600")
+                                ui.label(f"Uploaded: {file.upload_timestamp.strftime('%Y-%m-%d %H:%M')}").classes(
+                                    "text-sm text-gray-600"
+                                )
+
+                        with ui.row().classes("gap-2"):
+                            # Copy link button, handled entirely in the browser by copyFileLink from earl.js
+                            copy_button = ui.button("Copy Link", icon="link").props('onclick="copyFileLink(this)"')
+                            copy_button.props["data-url"] = file.public_url
+                            copy_button.classes("bg-blue-500 text-white px-4 py-2 rounded")
+
+                            # Direct link button
+                            ui.link("Open", file.public_url, new_tab=True).classes(
+                                "bg-green-500 text-white px-4 py-2 rounded no-underline"
+                            )
+                return card
+
+            def load_more_files() -> None:
+                """Append the next page of files to the list."""
+                nonlocal loaded_count
+                if files_list is None or load_more_button is None:
+                    return
+                files = get_uploaded_files(offset=loaded_count)
+                with files_list:
+                    for file in files:
+                        render_file_card(file)
+                loaded_count += len(files)
+                load_more_button.set_visibility(len(files) == FILES_PAGE_SIZE)
 
             def refresh_files() -> None:
-                """Refresh files list display."""
+                """Rebuild the whole files list display."""
+                nonlocal files_list, load_more_button, loaded_count
                 files_container.clear()
+                files_list = None
+                load_more_button = None
                 with files_container:
-                    files = get_all_uploaded_files()
+                    files = get_uploaded_files()
+                    loaded_count = len(files)
 
                     if not files:
                         with ui.card().classes("p-6 text-center bg-gray-50 rounded-xl"):
@@ -122,44 +185,24 @@ def create() -> None:
                     else:
                         ui.label("Uploaded Files").classes("text-2xl font-bold text-gray-800 mb-4")
 
-                        for file in files:
-                            with ui.card().classes(
-                                "p-4 bg-white shadow-md rounded-lg hover:shadow-lg transition-shadow"
-                            ):
-                                with ui.row().classes("w-full items-center justify-between"):
-                                    with ui.column().classes("flex-1"):
-                                        ui.label(file.original_filename).classes("font-semibold text-lg text-gray-800")
-                                        with ui.row().classes("gap-4 mt-1"):
-                                            ui.label(f"Size: {format_file_size(file.file_size)}").classes(
-                                                "text-sm text-gray-600"
-                                            )
-                                            ui.label(
-                                                f"Uploaded: {file.upload_timestamp.strftime('%Y-%m-%d %H:%M')}"
-                                            ).classes("text-sm text-gray-600")
-
-                                    with ui.row().classes("gap-2"):
-                                        # Copy link button
-                                        def copy_link(file_url: str):
-                                            ui.run_javascript(f'''
-                                                navigator.clipboard.writeText(window.location.origin + "{file_url}").then(() => {{
-                                                    // Success case handled by JavaScript
-                                                }});
-                                            ''')
-                                            ui.notify("Link copied to clipboard!", type="info")
-
-                                        ui.button(
-                                            "Copy Link",
-                                            icon="link",
-                                            on_click=lambda _, file_url=file.public_url: copy_link(file_url),
-                                        ).classes("bg-blue-500 text-white px-4 py-2 rounded")
-
-                                        # Direct link button
-                                        ui.link("Open", file.public_url, new_tab=True).classes(
-                                            "bg-green-500 text-white px-4 py-2 rounded no-underline"
-                                        )
+                        with ui.column().classes("w-full") as files_list:
+                            for file in files:
+                                render_file_card(file)
+
+                        load_more_button = ui.button("Load more", on_click=load_more_files).props("flat")
+                        load_more_button.set_visibility(len(files) == FILES_PAGE_SIZE)
+
+            def add_file(file: UploadedFile) -> None:
+                """Insert a newly uploaded file at the top of the list without rebuilding it."""
+                nonlocal loaded_count
+                if files_list is None:
+                    refresh_files()
+                    return
+                with files_list:
+                    render_file_card(file).move(target_index=0)
+                loaded_count += 1
 
             # Initial load
-            refresh_stats()
             refresh_files()
 
         # Footer
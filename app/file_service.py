@@ -1,17 +1,67 @@
-import uuid
+import asyncio
+import errno
+import hashlib
+import io
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import secrets
 import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Iterator, Optional, Union
 from fastapi import UploadFile
-from sqlmodel import select
-from datetime import datetime
+from sqlmodel import select, func
 from nicegui import events
 
 from app.database import get_session
-from app.models import UploadedFile, FileUploadStats
+from app.models import UploadedFile, FileUploadStats, FileDownloadInfo, UploadedFileSummary
+
+logger = logging.getLogger(__name__)
 
 UPLOADS_DIR = Path("uploads")
 MAX_FILE_SIZE = 300 * 1024 * 1024  # 300MB in bytes
+CHUNK_SIZE = 1024 * 1024  # 1MB chunks when streaming uploads to disk
+FILES_PAGE_SIZE = 200  # files loaded per page of the files list
+DIR_MTIME_TTL = 1.0  # seconds to trust the last seen uploads directory mtime
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+# Running totals shown in the UI, kept current by successful uploads instead of re-querying
+upload_stats = FileUploadStats(total_files=0, total_size_bytes=0)
+_upload_stats_lock = threading.Lock()
+
+# Dedicated pool so blocking upload I/O never runs on the event loop
+_io_pool = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4), thread_name_prefix="upload-io")
+
+# (uploads directory, monotonic time it was checked, its st_mtime_ns) for memoized file path lookups
+_uploads_dir_state: Optional[tuple[Path, float, int]] = None
+
+# Stage uploads in unnamed files where the platform supports it; cleared after the first failure
+_use_o_tmpfile = hasattr(os, "O_TMPFILE")
+
+# Common extensions resolved without going through the mimetypes database
+EXTENSION_CONTENT_TYPES = {
+    ".txt": "text/plain",
+    ".csv": "text/csv",
+    ".html": "text/html",
+    ".json": "application/json",
+    ".pdf": "application/pdf",
+    ".zip": "application/zip",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".svg": "image/svg+xml",
+    ".mp3": "audio/mpeg",
+    ".mp4": "video/mp4",
+}
 
 
 def ensure_uploads_directory() -> None:
@@ -22,147 +72,422 @@ def ensure_uploads_directory() -> None:
 def generate_unique_filename(original_filename: str) -> str:
     """Generate a unique filename to avoid conflicts."""
     file_extension = Path(original_filename).suffix
-    unique_id = str(uuid.uuid4())
+    unique_id = secrets.token_urlsafe(16)
     return f"{unique_id}{file_extension}"
 
 
-def get_file_stats() -> FileUploadStats:
-    """Get statistics about uploaded files."""
+def get_content_type(filename: str, declared_type: Optional[str]) -> str:
+    """Determine content type from the declared type, falling back to the file extension."""
+    if declared_type:
+        return declared_type
+
+    extension_type = EXTENSION_CONTENT_TYPES.get(Path(filename).suffix.lower())
+    if extension_type is not None:
+        return extension_type
+
+    # Only extensions missing from the map reach the mimetypes database
+    guessed_type, _ = mimetypes.guess_type(filename)
+    return guessed_type or DEFAULT_CONTENT_TYPE
+
+
+class _StagedUpload:
+    """Upload data written inside UPLOADS_DIR that only becomes visible once published under its final name.
+
+    On Linux the data goes to an unnamed O_TMPFILE that is linked into place; elsewhere a hidden temporary file
+    is renamed into place.
+    """
+
+    def __init__(self) -> None:
+        self.temp_path: Optional[Path] = None
+        try:
+            self.file = self._open()
+        except FileNotFoundError:
+            logger.info(f"Uploads directory {UPLOADS_DIR} is missing, creating it")
+            ensure_uploads_directory()
+            self.file = self._open()
+
+    def _open(self) -> BinaryIO:
+        global _use_o_tmpfile
+        if _use_o_tmpfile:
+            try:
+                fd = os.open(UPLOADS_DIR, os.O_TMPFILE | os.O_RDWR, 0o644)
+                return os.fdopen(fd, "w+b", buffering=CHUNK_SIZE)
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EISDIR, errno.EINVAL):
+                    raise
+                _use_o_tmpfile = False
+        return self._open_named()
+
+    def _open_named(self) -> BinaryIO:
+        fd, temp_name = tempfile.mkstemp(dir=UPLOADS_DIR, prefix=".upload-")
+        os.fchmod(fd, 0o644)
+        self.temp_path = Path(temp_name)
+        return os.fdopen(fd, "w+b", buffering=CHUNK_SIZE)
+
+    def publish(self, file_path: Path) -> None:
+        """Atomically make the staged data visible at file_path."""
+        global _use_o_tmpfile
+        self.file.flush()
+        if self.temp_path is None:
+            try:
+                os.link(f"/proc/self/fd/{self.file.fileno()}", file_path, follow_symlinks=True)
+                return
+            except OSError:
+                # linkat through /proc is not available everywhere; copy into a named file instead
+                logger.warning("Linking O_TMPFILE uploads failed, falling back to temporary files", exc_info=True)
+                _use_o_tmpfile = False
+                unnamed_file = self.file
+                self.file = self._open_named()
+                with unnamed_file:
+                    unnamed_file.seek(0)
+                    shutil.copyfileobj(unnamed_file, self.file, CHUNK_SIZE)
+                self.file.flush()
+        assert self.temp_path is not None
+        os.replace(self.temp_path, file_path)
+        self.temp_path = None
+
+    def discard(self) -> None:
+        """Close the staged file, removing its temporary name if it was never published."""
+        self.file.close()
+        if self.temp_path is not None:
+            self.temp_path.unlink(missing_ok=True)
+
+
+def _remaining_size(source: BinaryIO) -> Optional[int]:
+    """Get the number of unread bytes in a seekable source without reading it, or None if it is not seekable."""
+    if not source.seekable():
+        return None
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END) - position
+    source.seek(position)
+    return size
+
+
+def _stream_to_file(source: BinaryIO, target: BinaryIO, digest: "hashlib._Hash") -> Optional[int]:
+    """Stream source into target in chunks, hashing them into digest.
+
+    Returns bytes written, or None if MAX_FILE_SIZE is exceeded.
+    """
+    total_size = 0
+    while chunk := source.read(CHUNK_SIZE):
+        total_size += len(chunk)
+        if total_size > MAX_FILE_SIZE:
+            return None
+        digest.update(chunk)
+        target.write(chunk)
+    return total_size
+
+
+@contextmanager
+def _known_size_data(source: BinaryIO, size: int) -> Iterator[Union[memoryview, BinaryIO]]:
+    """Give the next size bytes of a seekable source as an in-memory view if it has one, else its backing file."""
+    # SpooledTemporaryFile keeps its data in a BytesIO until it rolls over to a real file; calling its fileno()
+    # would force that rollover, so look at the backing file directly
+    backing = getattr(source, "_file", source)
+    if not isinstance(backing, io.BytesIO):
+        yield backing
+        return
+    position = source.tell()
+    with backing.getbuffer() as buffer, buffer[position : position + size] as view:
+        yield view
+
+
+def _digest_known_size(source: BinaryIO, size: int) -> str:
+    """Get the SHA-256 hex digest of the next size bytes of a seekable source, leaving its position unchanged."""
+    with _known_size_data(source, size) as data:
+        if isinstance(data, memoryview):
+            return hashlib.sha256(data).hexdigest()
+
+        position = data.tell()
+        if isinstance(data, io.BufferedIOBase):
+            # file_digest reads into a reused buffer instead of allocating a bytes object per chunk
+            digest = hashlib.file_digest(data, "sha256")
+        else:
+            digest = hashlib.sha256()
+            while chunk := data.read(CHUNK_SIZE):
+                digest.update(chunk)
+        data.seek(position)
+        return digest.hexdigest()
+
+
+def _find_stored_duplicate(content_sha256: str, file_size: int) -> Optional[Path]:
+    """Get the path of an already stored file with the same content, if there is one."""
     with get_session() as session:
-        files = session.exec(select(UploadedFile)).all()
-        total_files = len(files)
-        total_size = sum(file.file_size for file in files)
-        return FileUploadStats(total_files=total_files, total_size_bytes=total_size)
+        stored_filename = session.exec(
+            select(UploadedFile.stored_filename)
+            .where(UploadedFile.content_sha256 == content_sha256, UploadedFile.file_size == file_size)
+            .limit(1)
+        ).first()
+    if stored_filename is None:
+        return None
+    return get_file_path(stored_filename)
 
 
-def save_upload_event(upload_event: events.UploadEventArguments) -> Optional[UploadedFile]:
-    """Save uploaded file from NiceGUI upload event."""
-    if upload_event.name is None:
+def _link_duplicate(duplicate_path: Optional[Path]) -> Optional[Path]:
+    """Hardlink an identical stored file to a hidden temporary name, or return None if there is none or it fails."""
+    if duplicate_path is None:
         return None
-
-    # Check file size
-    content = upload_event.content.read()
-    if len(content) > MAX_FILE_SIZE:
+    link_path = UPLOADS_DIR / f".upload-{secrets.token_urlsafe(16)}"
+    try:
+        os.link(duplicate_path, link_path)
+    except OSError:
+        logger.warning(f"Could not link duplicate upload {duplicate_path}, storing a copy instead", exc_info=True)
         return None
+    return link_path
+
 
-    ensure_uploads_directory()
+def _sendfile(source_fd: int, target_fd: int, offset: int, count: int) -> bool:
+    """Copy count bytes from source_fd at offset to target_fd in the kernel, returning False if unsupported."""
+    if not hasattr(os, "sendfile"):
+        return False
+    start, end = offset, offset + count
+    try:
+        while offset < end:
+            sent = os.sendfile(target_fd, source_fd, offset, end - offset)
+            if sent == 0:
+                raise EOFError(f"Upload ended after {offset} of {end} bytes")
+            offset += sent
+    except OSError:
+        # Platforms without file-to-file sendfile fail before copying anything
+        if offset != start:
+            raise
+        return False
+    return True
+
+
+def _copy_known_size(source: BinaryIO, target: BinaryIO, size: int) -> None:
+    """Copy size bytes from a seekable source into target without passing them through Python bytes objects."""
+    with _known_size_data(source, size) as data:
+        if isinstance(data, memoryview):
+            target.write(data)
+            return
+
+        try:
+            source_fd = data.fileno()
+        except (AttributeError, OSError):
+            logger.debug(f"Upload source {data!r} has no file descriptor, copying it through Python")
+            source_fd = None
+        if source_fd is not None:
+            target.flush()
+            copied = _sendfile(source_fd, target.fileno(), data.tell(), size)
+            # Resync the buffered writer with the position sendfile advanced to
+            target.seek(0, os.SEEK_END)
+            if copied:
+                return
+        shutil.copyfileobj(data, target, CHUNK_SIZE)
+
+
+def _invalidate_file_lookups() -> None:
+    """Make the next path lookups see a newly published file instead of cached misses."""
+    global _uploads_dir_state
+    _uploads_dir_state = None
+
+
+def _save_upload(source: BinaryIO, filename: str, declared_type: Optional[str]) -> Optional[UploadedFile]:
+    """Stage an upload on disk and record it, publishing the file only once its record is committed."""
+    # Spooled uploads know their size up front, so oversized ones are rejected before copying anything
+    known_size = _remaining_size(source)
+    if known_size is not None and known_size > MAX_FILE_SIZE:
+        return None
 
     # Generate unique filename
-    stored_filename = generate_unique_filename(upload_event.name)
+    stored_filename = generate_unique_filename(filename)
     file_path = UPLOADS_DIR / stored_filename
 
+    staged = None
+    duplicate_link = None
     try:
-        # Save file to disk
-        with open(file_path, "wb") as f:
-            f.write(content)
-
-        # Determine content type
-        content_type = upload_event.type or mimetypes.guess_type(upload_event.name)[0] or "application/octet-stream"
+        if known_size is not None:
+            # Hash before copying so content that is already stored never gets copied at all
+            file_size = known_size
+            content_sha256 = _digest_known_size(source, known_size)
+            duplicate_link = _link_duplicate(_find_stored_duplicate(content_sha256, file_size))
+            if duplicate_link is None:
+                staged = _StagedUpload()
+                _copy_known_size(source, staged.file, file_size)
+        else:
+            # Stream file to disk, rejecting it once it exceeds the size limit
+            staged = _StagedUpload()
+            digest = hashlib.sha256()
+            stream_size = _stream_to_file(source, staged.file, digest)
+            if stream_size is None:
+                return None
+            file_size = stream_size
+            content_sha256 = digest.hexdigest()
+            duplicate_link = _link_duplicate(_find_stored_duplicate(content_sha256, file_size))
 
         # Create database record
         uploaded_file = UploadedFile(
-            original_filename=upload_event.name,
+            original_filename=filename,
             stored_filename=stored_filename,
-            file_size=len(content),
-            content_type=content_type,
-            upload_timestamp=datetime.utcnow(),
+            file_size=file_size,
+            content_type=get_content_type(filename, declared_type),
+            content_sha256=content_sha256,
             public_url=f"/files/{stored_filename}",
         )
 
         with get_session() as session:
             session.add(uploaded_file)
-            session.commit()
+            # Commit and count together so a concurrent refresh_upload_stats sees both or neither
+            with _upload_stats_lock:
+                session.commit()
+                _record_upload_stats(1, file_size)
             session.refresh(uploaded_file)
-            return uploaded_file
 
-    except Exception:
-        import logging
+        # The data is already on disk, so publishing it under its final name is just a rename or link
+        try:
+            if duplicate_link is not None:
+                os.replace(duplicate_link, file_path)
+                duplicate_link = None
+            else:
+                assert staged is not None
+                staged.publish(file_path)
+        except Exception:
+            # A record without its file would only ever serve 404s
+            with get_session() as session:
+                orphan = session.get(UploadedFile, uploaded_file.id)
+                if orphan is not None:
+                    session.delete(orphan)
+                    with _upload_stats_lock:
+                        session.commit()
+                        _record_upload_stats(-1, -file_size)
+            raise
+        _invalidate_file_lookups()
+        return uploaded_file
 
-        logging.exception(f"Failed to save uploaded file {upload_event.name}")
-        # Clean up file if database operation fails
-        if file_path.exists():
-            file_path.unlink()
+    except Exception:
+        logger.exception(f"Failed to save uploaded file {filename}")
         return None
+    finally:
+        if staged is not None:
+            staged.discard()
+        if duplicate_link is not None:
+            duplicate_link.unlink(missing_ok=True)
 
 
-def save_uploaded_file(upload_file: UploadFile) -> Optional[UploadedFile]:
-    """Save uploaded file and create database record."""
-    if upload_file.filename is None:
-        return None
+def get_file_stats() -> FileUploadStats:
+    """Get statistics about uploaded files."""
+    with get_session() as session:
+        total_files, total_size = session.exec(
+            select(func.count(), func.coalesce(func.sum(UploadedFile.file_size), 0))
+        ).one()
+        return FileUploadStats(total_files=total_files, total_size_bytes=total_size)
 
-    # Check file size
-    content = upload_file.file.read()
-    if len(content) > MAX_FILE_SIZE:
-        return None
 
-    ensure_uploads_directory()
+def refresh_upload_stats() -> FileUploadStats:
+    """Reload the running upload totals from the database and return them."""
+    # Saves commit under the same lock, so the totals never count an upload twice or miss one
+    with _upload_stats_lock:
+        stats = get_file_stats()
+        upload_stats.total_files = stats.total_files
+        upload_stats.total_size_bytes = stats.total_size_bytes
+    return upload_stats
 
-    # Generate unique filename
-    stored_filename = generate_unique_filename(upload_file.filename)
-    file_path = UPLOADS_DIR / stored_filename
 
-    try:
-        # Save file to disk
-        with open(file_path, "wb") as f:
-            f.write(content)
+def _record_upload_stats(file_count: int, file_size: int) -> None:
+    """Adjust the running upload totals; callers hold _upload_stats_lock across the matching commit."""
+    upload_stats.total_files += file_count
+    upload_stats.total_size_bytes += file_size
 
-        # Determine content type
-        content_type = (
-            upload_file.content_type or mimetypes.guess_type(upload_file.filename)[0] or "application/octet-stream"
-        )
 
-        # Create database record
-        uploaded_file = UploadedFile(
-            original_filename=upload_file.filename,
-            stored_filename=stored_filename,
-            file_size=len(content),
-            content_type=content_type,
-            upload_timestamp=datetime.utcnow(),
-            public_url=f"/files/{stored_filename}",
-        )
+def save_upload_event(upload_event: events.UploadEventArguments) -> Optional[UploadedFile]:
+    """Save uploaded file from NiceGUI upload event."""
+    if upload_event.name is None:
+        return None
+    return _save_upload(upload_event.content, upload_event.name, upload_event.type)
 
-        with get_session() as session:
-            session.add(uploaded_file)
-            session.commit()
-            session.refresh(uploaded_file)
-            return uploaded_file
 
-    except Exception:
-        import logging
+async def save_upload_event_async(upload_event: events.UploadEventArguments) -> Optional[UploadedFile]:
+    """Save uploaded file from NiceGUI upload event on the I/O thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(_io_pool, save_upload_event, upload_event)
+
 
-        logging.exception(f"Failed to save uploaded file {upload_file.filename}")
-        # Clean up file if database operation fails
-        if file_path.exists():
-            file_path.unlink()
+def save_uploaded_file(upload_file: UploadFile) -> Optional[UploadedFile]:
+    """Save uploaded file and create database record."""
+    if upload_file.filename is None:
         return None
+    return _save_upload(upload_file.file, upload_file.filename, upload_file.content_type)
 
 
-def get_file_path(stored_filename: str) -> Optional[Path]:
-    """Get the file system path for a stored file."""
-    file_path = UPLOADS_DIR / stored_filename
+def _uploads_dir_mtime_ns() -> int:
+    """Get the uploads directory mtime, re-reading it at most once per DIR_MTIME_TTL."""
+    global _uploads_dir_state
+    now = time.monotonic()
+    state = _uploads_dir_state
+    if state is not None and state[0] == UPLOADS_DIR and now - state[1] < DIR_MTIME_TTL:
+        return state[2]
+    try:
+        mtime_ns = UPLOADS_DIR.stat().st_mtime_ns
+    except FileNotFoundError:
+        logger.debug(f"Uploads directory {UPLOADS_DIR} does not exist yet")
+        mtime_ns = 0
+    _uploads_dir_state = (UPLOADS_DIR, now, mtime_ns)
+    return mtime_ns
+
+
+@lru_cache(maxsize=8192)
+def _cached_file_path(uploads_dir: Path, stored_filename: str, dir_mtime_ns: int) -> Optional[Path]:
+    file_path = uploads_dir / stored_filename
     if file_path.exists():
         return file_path
     return None
 
 
-def get_all_uploaded_files() -> list[UploadedFile]:
-    """Get all uploaded files from database."""
+def get_file_path(stored_filename: str) -> Optional[Path]:
+    """Get the file system path for a stored file."""
+    # Adding or removing files changes the directory mtime, which invalidates cached lookups
+    return _cached_file_path(UPLOADS_DIR, stored_filename, _uploads_dir_mtime_ns())
+
+
+@lru_cache(maxsize=4096)
+def _cached_file_download_info(stored_filename: str) -> FileDownloadInfo:
+    """Look up download metadata, raising LookupError for unknown names so that misses are never cached."""
     with get_session() as session:
-        from sqlmodel import desc
+        original_filename = session.exec(
+            select(UploadedFile.original_filename).where(UploadedFile.stored_filename == stored_filename)
+        ).first()
+    if original_filename is None:
+        raise LookupError(stored_filename)
+    # Serve with the type of the stored extension, never the uploader's declared type, so an upload cannot
+    # declare itself as HTML and render on this origin under another extension
+    return FileDownloadInfo(original_filename=original_filename, content_type=get_content_type(stored_filename, None))
+
+
+def get_file_download_info(stored_filename: str) -> Optional[FileDownloadInfo]:
+    """Get the original filename and served content type of a stored file, cached per existing filename."""
+    # Stored filenames are unique and never reused, so cached hits never go stale
+    try:
+        return _cached_file_download_info(stored_filename)
+    except LookupError:
+        logger.debug(f"No upload record for stored file {stored_filename}")
+        return None
 
-        return list(session.exec(select(UploadedFile).order_by(desc(UploadedFile.upload_timestamp))).all())
 
+def get_uploaded_files(limit: int = FILES_PAGE_SIZE, offset: int = 0) -> list[UploadedFileSummary]:
+    """Get a page of uploaded files from database, newest first."""
+    with get_session() as session:
+        from sqlmodel import desc
 
+        rows = session.exec(
+            select(
+                UploadedFile.original_filename,
+                UploadedFile.file_size,
+                UploadedFile.upload_timestamp,
+                UploadedFile.public_url,
+            )
+            .order_by(desc(UploadedFile.upload_timestamp))
+            .offset(offset)
+            .limit(limit)
+        ).all()
+        return [UploadedFileSummary._make(row) for row in rows]
+
+
+@lru_cache(maxsize=1024)
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human readable format."""
     if size_bytes == 0:
         return "0 B"
 
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    size_float = float(size_bytes)
-    while size_float >= 1024 and i < len(size_names) - 1:
-        size_float /= 1024
-        i += 1
-
-    return f"{size_float:.1f} {size_names[i]}"
+    # Each unit is 2**10 of the previous one, so the bit length picks the unit directly
+    i = min((size_bytes.bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (i * 10)):.1f} {SIZE_UNITS[i]}"
@@ -1,6 +1,6 @@
 from sqlmodel import SQLModel, Field
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
 
 
 class UploadedFile(SQLModel, table=True):
@@ -13,7 +13,12 @@ class UploadedFile(SQLModel, table=True):
     stored_filename: str = Field(max_length=255, unique=True)
     file_size: int = Field(description="File size in bytes")
     content_type: str = Field(max_length=100)
-    upload_timestamp: datetime = Field(default_factory=datetime.utcnow)
+    content_sha256: Optional[str] = Field(default=None, max_length=64, index=True, description="SHA-256 of content")
+    # Naive UTC to match the "timestamp without time zone" column; an aware value would be shifted by the
+    # server's session TimeZone on insert
+    upload_timestamp: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None), index=True
+    )
     public_url: str = Field(max_length=500, description="Public URL to access the file")
 
 
@@ -22,3 +27,19 @@ class FileUploadStats(SQLModel, table=False):
 
     total_files: int
     total_size_bytes: int
+
+
+class FileDownloadInfo(SQLModel, table=False):
+    """Schema for the metadata needed to serve a stored file."""
+
+    original_filename: str
+    content_type: str
+
+
+class UploadedFileSummary(NamedTuple):
+    """Uploaded file fields shown in the files list, built straight from column rows without validation."""
+
+    original_filename: str
+    file_size: int
+    upload_timestamp: datetime
+    public_url: str
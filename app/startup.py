@@ -1,3 +1,4 @@
+import mimetypes
 from app.database import create_tables
 from app.file_service import ensure_uploads_directory
 import app.earl_box
@@ -6,5 +7,7 @@ import app.earl_box
 def startup() -> None:
     # this function is called before the first request
     create_tables()
+    # load the MIME database up front instead of lazily on the first upload
+    mimetypes.init()
     ensure_uploads_directory()
     app.earl_box.create()
@@ -0,0 +1,6 @@
+// Shared by every "Copy Link" button, which carries its file URL in a data-url attribute
+function copyFileLink(button) {
+    navigator.clipboard.writeText(window.location.origin + button.dataset.url).then(() => {
+        Quasar.Notify.create({ message: "Link copied to clipboard!", type: "info" });
+    });
+}
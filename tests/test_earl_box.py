@@ -50,6 +50,17 @@ class TestEarlBoxUI:
         await user.should_see("Simple file sharing made easy")
         await user.should_see("Created by Earl Store❤️")
 
+    async def test_shared_assets_survive_repeated_startup(self, user: User):
+        """Test the theme is applied under test and shared head entries are only added once."""
+        from nicegui import Client, app
+        from app.startup import startup
+
+        startup()
+
+        assert app.config.quasar_config["brand"]["primary"] == "#2563eb"
+        assert Client.shared_head_html.count("/static/earl.css") == 1
+        assert Client.shared_head_html.count("/static/earl.js") == 1
+
     async def test_initial_stats_display(self, user: User, new_db):
         """Test initial statistics display with no files."""
         await user.open("/")
@@ -83,6 +94,21 @@ class TestEarlBoxUI:
         # Stats should be updated (wait a moment for UI refresh)
         await user.should_see("1")  # Should show 1 file
 
+    async def test_upload_adds_file_to_existing_list(self, user: User, new_db, temp_uploads):
+        """Test that a new upload is added on top of an already rendered files list."""
+        uploaded_file = save_uploaded_file(create_test_upload_file("existing.txt", b"existing"))
+        assert uploaded_file is not None
+
+        await user.open("/")
+        await user.should_see("existing.txt")
+
+        upload = user.find(ui.upload).elements.pop()
+        upload.handle_uploads([create_test_upload_file("new.txt", b"new content")])
+
+        await user.should_see("uploaded successfully")
+        await user.should_see("new.txt")
+        await user.should_see("existing.txt")
+
     async def test_files_list_with_uploads(self, user: User, new_db, temp_uploads):
         """Test files list display after uploading files."""
         # Pre-upload a file using service
@@ -7,12 +7,14 @@ from app.database import reset_db
 from app.file_service import (
     save_uploaded_file,
     get_file_stats,
+    refresh_upload_stats,
     get_file_path,
-    get_all_uploaded_files,
+    get_file_download_info,
+    get_uploaded_files,
     format_file_size,
     generate_unique_filename,
+    get_content_type,
     ensure_uploads_directory,
-    MAX_FILE_SIZE,
 )
 
 
@@ -58,6 +60,7 @@ class TestFileService:
         assert filename1 != filename2
         assert filename1.endswith(".txt")
         assert filename2.endswith(".txt")
+        assert len(filename1) == 22 + len(".txt")
 
     def test_ensure_uploads_directory(self, temp_uploads):
         """Test uploads directory creation."""
@@ -78,6 +81,16 @@ class TestFileService:
         assert format_file_size(1536) == "1.5 KB"
         assert format_file_size(1024 * 1024) == "1.0 MB"
         assert format_file_size(1024 * 1024 * 1024) == "1.0 GB"
+        assert format_file_size(1024**4) == "1.0 TB"
+        assert format_file_size(1024**5) == "1024.0 TB"
+
+    def test_get_content_type(self):
+        """Test content type resolution order."""
+        assert get_content_type("photo.png", "image/webp") == "image/webp"
+        assert get_content_type("photo.PNG", None) == "image/png"
+        assert get_content_type("photo.png", "") == "image/png"
+        assert get_content_type("archive.tar", None) == "application/x-tar"
+        assert get_content_type("no_extension", None) == "application/octet-stream"
 
     def test_save_uploaded_file_success(self, new_db, temp_uploads):
         """Test successful file upload."""
@@ -97,6 +110,88 @@ class TestFileService:
         assert file_path.exists()
         assert file_path.read_bytes() == test_content
 
+    def test_save_uploaded_file_leaves_no_staging_files(self, new_db, temp_uploads, monkeypatch):
+        """Test that both O_TMPFILE and temporary-file staging publish only the stored file."""
+        import app.file_service
+
+        for use_o_tmpfile in (True, False):
+            monkeypatch.setattr(app.file_service, "_use_o_tmpfile", use_o_tmpfile)
+            result = save_uploaded_file(create_test_upload_file("staged.txt", b"staged content"))
+
+            assert result is not None
+            assert (temp_uploads / result.stored_filename).read_bytes() == b"staged content"
+
+        assert len(list(temp_uploads.iterdir())) == 2
+
+    def test_save_uploaded_file_from_spooled_file(self, new_db, temp_uploads):
+        """Test saving spooled uploads both while in memory and after rolling over to disk."""
+        from tempfile import SpooledTemporaryFile
+
+        for content in (b"small", b"x" * (2 * 1024 * 1024)):
+            spooled = SpooledTemporaryFile(max_size=1024 * 1024)
+            spooled.write(content)
+            spooled.seek(0)
+
+            result = save_uploaded_file(UploadFile(spooled, filename="spooled.bin"))  # type: ignore[arg-type]
+
+            assert result is not None
+            assert result.file_size == len(content)
+            assert (temp_uploads / result.stored_filename).read_bytes() == content
+
+    def test_save_uploaded_file_deduplicates_content(self, new_db, temp_uploads):
+        """Test identical uploads share one stored file through a hardlink."""
+        import hashlib
+
+        first = save_uploaded_file(create_test_upload_file("first.txt", b"same content"))
+        second = save_uploaded_file(create_test_upload_file("second.txt", b"same content"))
+        different = save_uploaded_file(create_test_upload_file("third.txt", b"other content"))
+
+        assert first is not None and second is not None and different is not None
+        assert first.content_sha256 == hashlib.sha256(b"same content").hexdigest()
+        assert second.content_sha256 == first.content_sha256
+        assert second.stored_filename != first.stored_filename
+
+        first_stat = (temp_uploads / first.stored_filename).stat()
+        second_stat = (temp_uploads / second.stored_filename).stat()
+        assert second_stat.st_ino == first_stat.st_ino
+        assert (temp_uploads / second.stored_filename).read_bytes() == b"same content"
+        assert (temp_uploads / different.stored_filename).stat().st_ino != first_stat.st_ino
+        assert len(list(temp_uploads.iterdir())) == 3
+
+    def test_create_tables_adds_content_hash_to_existing_table(self, new_db, temp_uploads):
+        """Test tables created before content hashing gain the column and can deduplicate again."""
+        from sqlmodel import text
+        from app.database import ENGINE, create_tables
+
+        with ENGINE.begin() as conn:
+            conn.execute(text("ALTER TABLE uploaded_files DROP COLUMN content_sha256"))
+
+        create_tables()
+
+        first = save_uploaded_file(create_test_upload_file("first.txt", b"migrated"))
+        second = save_uploaded_file(create_test_upload_file("second.txt", b"migrated"))
+        assert first is not None and second is not None
+        assert (temp_uploads / first.stored_filename).stat().st_ino == (
+            temp_uploads / second.stored_filename
+        ).stat().st_ino
+        with ENGINE.connect() as conn:
+            indexes = conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = 'uploaded_files'"))
+            assert "ix_uploaded_files_content_sha256" in {row[0] for row in indexes}
+
+    def test_save_uploaded_file_copies_before_recording(self, new_db, temp_uploads, monkeypatch):
+        """Test a failed copy leaves neither a database record nor a stored file."""
+        import app.file_service
+
+        def failing_copy(source, target, count):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(app.file_service, "_copy_known_size", failing_copy)
+        result = save_uploaded_file(create_test_upload_file("failed.txt", b"never stored"))
+
+        assert result is None
+        assert get_file_stats().total_files == 0
+        assert list(temp_uploads.iterdir()) == []
+
     def test_save_uploaded_file_no_filename(self, new_db):
         """Test upload with no filename."""
         upload_file = UploadFile(BytesIO(b"content"))
@@ -106,14 +201,33 @@ class TestFileService:
 
         assert result is None
 
-    def test_save_uploaded_file_too_large(self, new_db):
+    def test_save_uploaded_file_too_large(self, new_db, temp_uploads, monkeypatch):
         """Test upload file too large."""
-        large_content = b"x" * (MAX_FILE_SIZE + 1)
-        upload_file = create_test_upload_file("large.txt", large_content)
+        import app.file_service
+
+        monkeypatch.setattr(app.file_service, "MAX_FILE_SIZE", 16)
+        upload_file = create_test_upload_file("large.txt", b"x" * 17)
+
+        result = save_uploaded_file(upload_file)
+
+        assert result is None
+        assert list(temp_uploads.glob("*")) == []
+
+    def test_save_uploaded_file_too_large_unseekable(self, new_db, temp_uploads, monkeypatch):
+        """Test oversized upload from a non-seekable stream is rejected while streaming."""
+        import app.file_service
+
+        class UnseekableBytesIO(BytesIO):
+            def seekable(self) -> bool:
+                return False
+
+        monkeypatch.setattr(app.file_service, "MAX_FILE_SIZE", 16)
+        upload_file = UploadFile(UnseekableBytesIO(b"x" * 17), filename="large.txt")
 
         result = save_uploaded_file(upload_file)
 
         assert result is None
+        assert list(temp_uploads.iterdir()) == []
 
     def test_get_file_stats_empty(self, new_db):
         """Test file stats with no files."""
@@ -139,6 +253,33 @@ class TestFileService:
         assert stats.total_files == 2
         assert stats.total_size_bytes == len(content1) + len(content2)
 
+    def test_upload_stats_track_saved_files(self, new_db, temp_uploads):
+        """Test running upload totals are updated by saves without re-querying."""
+        stats = refresh_upload_stats()
+        assert stats.total_files == 0
+        assert stats.total_size_bytes == 0
+
+        save_uploaded_file(create_test_upload_file("tracked.txt", b"tracked"))
+
+        assert stats.total_files == 1
+        assert stats.total_size_bytes == len(b"tracked")
+        assert get_file_stats() == stats
+
+    def test_upload_stats_exclude_unpublished_files(self, new_db, temp_uploads, monkeypatch):
+        """Test an upload whose file cannot be published is removed from the running totals again."""
+        import app.file_service
+
+        def failing_publish(self, file_path):
+            raise OSError("rename failed")
+
+        stats = refresh_upload_stats()
+        monkeypatch.setattr(app.file_service._StagedUpload, "publish", failing_publish)
+
+        assert save_uploaded_file(create_test_upload_file("lost.txt", b"lost")) is None
+        assert stats.total_files == 0
+        assert stats.total_size_bytes == 0
+        assert get_file_stats() == stats
+
     def test_get_file_path_exists(self, temp_uploads):
         """Test getting path for existing file."""
         # Create test file
@@ -156,7 +297,63 @@ class TestFileService:
 
         assert result is None
 
-    def test_get_all_uploaded_files(self, new_db, temp_uploads):
+    def test_get_file_path_sees_new_upload(self, new_db, temp_uploads):
+        """Test that memoized path lookups pick up a file uploaded right after a lookup."""
+        ensure_uploads_directory()
+        assert get_file_path("nonexistent.txt") is None
+
+        uploaded_file = save_uploaded_file(create_test_upload_file("fresh.txt", b"fresh"))
+        assert uploaded_file is not None
+
+        assert get_file_path(uploaded_file.stored_filename) == temp_uploads / uploaded_file.stored_filename
+
+    def test_get_file_download_info(self, new_db, temp_uploads):
+        """Test download metadata lookup for stored files."""
+        upload_file = create_test_upload_file("report.pdf", b"%PDF-1.4", "application/pdf")
+        uploaded_file = save_uploaded_file(upload_file)
+        assert uploaded_file is not None
+
+        info = get_file_download_info(uploaded_file.stored_filename)
+
+        assert info is not None
+        assert info.original_filename == "report.pdf"
+        assert info.content_type == "application/pdf"
+        assert get_file_download_info("nonexistent.pdf") is None
+
+    def test_get_file_download_info_ignores_declared_type(self, new_db, temp_uploads):
+        """Test files are served with the type of their stored extension, not the uploader's declared type."""
+        uploaded_file = save_uploaded_file(create_test_upload_file("cat.png", b"<script>", "text/html"))
+        assert uploaded_file is not None
+
+        info = get_file_download_info(uploaded_file.stored_filename)
+
+        assert info is not None
+        assert info.content_type == "image/png"
+
+    def test_get_file_download_info_does_not_cache_misses(self, new_db):
+        """Test that a lookup miss does not hide a record added afterwards."""
+        from app.database import get_session
+        from app.models import UploadedFile
+
+        assert get_file_download_info("later.txt") is None
+
+        with get_session() as session:
+            session.add(
+                UploadedFile(
+                    original_filename="later.txt",
+                    stored_filename="later.txt",
+                    file_size=0,
+                    content_type="text/plain",
+                    public_url="/files/later.txt",
+                )
+            )
+            session.commit()
+
+        info = get_file_download_info("later.txt")
+        assert info is not None
+        assert info.original_filename == "later.txt"
+
+    def test_get_uploaded_files(self, new_db, temp_uploads):
         """Test retrieving all uploaded files."""
         # Upload files
         upload1 = create_test_upload_file("first.txt", b"first")
@@ -165,13 +362,24 @@ class TestFileService:
         save_uploaded_file(upload1)
         save_uploaded_file(upload2)
 
-        files = get_all_uploaded_files()
+        files = get_uploaded_files()
 
         assert len(files) == 2
         # Should be ordered by upload timestamp descending
         assert files[0].original_filename == "second.txt"
         assert files[1].original_filename == "first.txt"
 
+    def test_get_uploaded_files_pagination(self, new_db, temp_uploads):
+        """Test paging through uploaded files."""
+        for name in ("first.txt", "second.txt", "third.txt"):
+            save_uploaded_file(create_test_upload_file(name, b"content"))
+
+        first_page = get_uploaded_files(limit=2)
+        second_page = get_uploaded_files(limit=2, offset=2)
+
+        assert [file.original_filename for file in first_page] == ["third.txt", "second.txt"]
+        assert [file.original_filename for file in second_page] == ["first.txt"]
+
     def test_save_uploaded_file_different_content_types(self, new_db, temp_uploads):
         """Test saving files with different content types."""
         # Test image file